@@ -8,11 +8,32 @@ TARGET_WALLETS = [
     ("0x000d257d2dc7616feaef4ae0f14600fdf50a758e", 1000),
 ]
 
+# Comptes followers (fan-out): (nom, préfixe .env, {wallet: montant_alloué})
+# Credentials lus dans {préfixe}_PRIVATE_KEY / _FUNDER / _SIGNATURE_TYPE
+# Vide = compte unique POLYMARKET_* avec les allocations de TARGET_WALLETS
+FOLLOWER_ACCOUNTS = [
+    # ("alice", "ALICE", {"0x000d257d2dc7616feaef4ae0f14600fdf50a758e": 500}),
+]
+
 # Exécution
 MAX_SLIPPAGE = 0.05  # 5% max, sinon skip
 MIN_PRICE = 0.01 # prix mini d'achat
 MAX_PRICE = 0.99 # prix max d'achat
 POLL_INTERVAL = 3.0
+SLICE_THRESHOLD = 200  # USDC: au-delà, ordre découpé selon la profondeur du carnet (live)
+SLICE_PARTICIPATION = 0.5  # part max de la profondeur dispo (sous MAX_SLIPPAGE) par slice
+SLICE_INTERVAL = 0.5  # pause (s) entre slices
+SLICE_HORIZON = 10.0  # durée max (s) d'un ordre découpé
+SLICE_MIN = 5.0  # USDC: slice minimale, en dessous l'ordre découpé s'arrête
+PRETRADE_TIMEOUT = 5.0  # deadline (s) pour wallet value + prix en parallèle
+QUOTE_TTL = 3.0  # durée de vie (s) des prix pré-chargés pour les SELL
+
+# Détection: "api" (data-api /activity par wallet) ou "chain" (events OrderFilled on-chain)
+DETECTOR = "api"
+POLYGON_RPC_URL = "https://polygon-rpc.com"
+CHAIN_POLL_INTERVAL = 1.0  # ~1 bloc Polygon (2s)
+CHAIN_RESCAN_BLOCKS = 5  # blocs re-scannés à chaque poll (node en retard, reorgs)
 
 # Fichier de sauvegarde
-SAVE_FILE = "copytrading_state.json"
\ No newline at end of file
+SAVE_FILE = "copytrading_state.json"
+DB_FILE = "copytrading.db"  # historique indexé (SQLite)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Polymarket On-chain Detector
+Détecte les fills des wallets suivis via les events OrderFilled du CTF Exchange (Polygon)
+
+Chaque ordre exécuté émet un OrderFilled dont le maker est le signataire de
+l'ordre (y compris l'ordre taker, émis avec taker = exchange). Filtrer sur le
+maker suffit donc à voir tous les fills d'un wallet, une seule fois.
+"""
+import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from CONFIG import POLYGON_RPC_URL
+
+GAMMA_URL = "https://gamma-api.polymarket.com"
+
+CTF_EXCHANGE = "0x4bfb41d5b3570defd03c39a9a4d8de6bd8b8982e"
+NEG_RISK_CTF_EXCHANGE = "0xc5d563a36ae78145c45a50134d48a1215220f80a"
+
+# keccak256("OrderFilled(bytes32,address,address,uint256,uint256,uint256,uint256,uint256)")
+ORDER_FILLED_TOPIC = "0xd0a08e8c493f9c94f29311604c9de1b4e8c8d4c06bd0c789af57f2d65bfec0f6"
+
+MAX_BLOCK_RANGE = 500     # blocs max par eth_getLogs
+TOPIC_FILTER_MAX = 50     # au-delà, filtrage local uniquement (liste d'adresses trop longue pour le node)
+
+_session = requests.Session()
+_markets = {}        # asset -> (title, outcome), lookups réussis uniquement
+_lookups = set()     # assets en cours de résolution
+_lookup_executor = ThreadPoolExecutor(max_workers=4)
+
+
+# ============ JSON-RPC ============
+
+def rpc(method, params, url=POLYGON_RPC_URL):
+    """Appel JSON-RPC simple"""
+    r = _session.post(url, json={"jsonrpc": "2.0", "method": method, "params": params, "id": 1}, timeout=10)
+    r.raise_for_status()
+    data = r.json()
+    if "error" in data:
+        raise RuntimeError(f"{method}: {data['error']}")
+    return data["result"]
+
+
+def rpc_batch(calls, url=POLYGON_RPC_URL):
+    """Appel JSON-RPC batch [(method, params), ...]. Retourne les résultats dans l'ordre"""
+    if not calls:
+        return []
+    payload = [{"jsonrpc": "2.0", "method": m, "params": p, "id": i} for i, (m, p) in enumerate(calls)]
+    r = _session.post(url, json=payload, timeout=10)
+    r.raise_for_status()
+    results = [None] * len(calls)
+    for item in r.json():
+        if "error" in item:
+            raise RuntimeError(f"{calls[item['id']][0]}: {item['error']}")
+        results[item["id"]] = item["result"]
+    return results
+
+
+def get_block_number(url=POLYGON_RPC_URL):
+    """Numéro du dernier bloc"""
+    return int(rpc("eth_blockNumber", [], url), 16)
+
+
+def get_logs(from_block, to_block, makers=None, url=POLYGON_RPC_URL):
+    """Récupère les events OrderFilled des deux exchanges sur [from_block, to_block]"""
+    topics = [ORDER_FILLED_TOPIC]
+    if makers and len(makers) <= TOPIC_FILTER_MAX:
+        topics += [None, ["0x" + m[2:].zfill(64) for m in sorted(makers)]]
+    return rpc("eth_getLogs", [{
+        "address": [CTF_EXCHANGE, NEG_RISK_CTF_EXCHANGE],
+        "topics": topics,
+        "fromBlock": hex(from_block),
+        "toBlock": hex(to_block),
+    }], url)
+
+
+def get_block_timestamps(blocks, url=POLYGON_RPC_URL):
+    """Timestamps de plusieurs blocs en un seul appel batch. Retourne {block: ts}"""
+    blocks = sorted(set(blocks))
+    results = rpc_batch([("eth_getBlockByNumber", [hex(b), False]) for b in blocks], url)
+    return {b: int(res["timestamp"], 16) for b, res in zip(blocks, results) if res}
+
+
+# ============ DÉCODAGE ============
+
+def decode_fill(log):
+    """Décode un log OrderFilled -> dict (adresses en minuscules, montants bruts)"""
+    data = log["data"][2:]
+    words = [int(data[i:i + 64], 16) for i in range(0, 64 * 5, 64)]
+    return {
+        "order_hash": log["topics"][1],
+        "maker": "0x" + log["topics"][2][-40:].lower(),
+        "taker": "0x" + log["topics"][3][-40:].lower(),
+        "maker_asset": words[0],
+        "taker_asset": words[1],
+        "maker_amount": words[2],
+        "taker_amount": words[3],
+        "fee": words[4],
+        "block": int(log["blockNumber"], 16),
+        "tx": log["transactionHash"],
+        "log_index": int(log["logIndex"], 16),
+    }
+
+
+def fetch_market_info(asset):
+    """Résout (title, outcome) d'un token via Gamma. Seuls les succès sont mis en cache"""
+    try:
+        r = requests.get(f"{GAMMA_URL}/markets", params={"clob_token_ids": asset}, timeout=5)
+        if r.status_code == 200 and r.json():
+            m = r.json()[0]
+            tokens = json.loads(m.get("clobTokenIds") or "[]")
+            outcomes = json.loads(m.get("outcomes") or "[]")
+            outcome = outcomes[tokens.index(asset)] if asset in tokens and len(outcomes) == len(tokens) else ""
+            _markets[asset] = (m.get("question", ""), outcome)
+    except:
+        pass
+    finally:
+        _lookups.discard(asset)
+
+
+def get_market_info(asset):
+    """Retourne (title, outcome) depuis le cache, sans bloquer: un asset inconnu est résolu en arrière-plan"""
+    if asset in _markets:
+        return _markets[asset]
+    if asset not in _lookups:
+        _lookups.add(asset)
+        _lookup_executor.submit(fetch_market_info, asset)
+    return ("", "")
+
+
+def fill_to_trade(fill, timestamp):
+    """Convertit un fill au format /activity attendu par process_trade"""
+    # makerAsset == 0 (USDC) -> le maker achète des tokens
+    if fill["maker_asset"] == 0:
+        side, asset = "BUY", str(fill["taker_asset"])
+        usdc, size = fill["maker_amount"] / 1e6, fill["taker_amount"] / 1e6
+    else:
+        side, asset = "SELL", str(fill["maker_asset"])
+        usdc, size = fill["taker_amount"] / 1e6, fill["maker_amount"] / 1e6
+
+    title, outcome = get_market_info(asset)
+    return {
+        "wallet": fill["maker"],
+        "asset": asset,
+        "side": side,
+        "price": usdc / size if size > 0 else 0,
+        "size": size,
+        "usdcSize": usdc,
+        "timestamp": timestamp,
+        "title": title,
+        "outcome": outcome,
+        "transactionHash": fill["tx"],
+        "logIndex": fill["log_index"],
+        "orderHash": fill["order_hash"],
+    }
+
+
+# ============ DÉTECTION ============
+
+def poll_fills(wallets, from_block, to_block=None, url=POLYGON_RPC_URL):
+    """Récupère les fills des wallets suivis sur [from_block, to_block].
+    Retourne (trades triés par bloc, dernier bloc traité)"""
+    if to_block is None:
+        to_block = get_block_number(url)
+    if from_block > to_block:
+        return [], to_block
+
+    tracked = {w.lower() for w in wallets}
+    fills = []
+    for start in range(from_block, to_block + 1, MAX_BLOCK_RANGE):
+        end = min(start + MAX_BLOCK_RANGE - 1, to_block)
+        for log in get_logs(start, end, tracked, url):
+            # topics[2] = maker indexé: lookup O(1) avant tout décodage
+            if "0x" + log["topics"][2][-40:].lower() in tracked:
+                fills.append(decode_fill(log))
+
+    timestamps = get_block_timestamps([f["block"] for f in fills], url) if fills else {}
+    fills.sort(key=lambda f: (f["block"], f["log_index"]))
+    return [fill_to_trade(f, timestamps.get(f["block"], 0)) for f in fills], to_block
@@ -4,15 +4,21 @@ Polymarket Copytrading Monitor
 import json
 import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 from datetime import datetime
 from pathlib import Path
 
 from CONFIG import (
-    MODE, TARGET_WALLETS,
+    MODE, TARGET_WALLETS, FOLLOWER_ACCOUNTS,
     MIN_PRICE, MAX_PRICE,
-    MAX_SLIPPAGE, POLL_INTERVAL, SAVE_FILE
+    MAX_SLIPPAGE, POLL_INTERVAL, SAVE_FILE,
+    PRETRADE_TIMEOUT, QUOTE_TTL, DB_FILE,
+    DETECTOR, CHAIN_POLL_INTERVAL, CHAIN_RESCAN_BLOCKS,
+    SLICE_THRESHOLD, SLICE_PARTICIPATION, SLICE_INTERVAL, SLICE_HORIZON, SLICE_MIN
 )
 import polymarket_trades as pm
+import polymarket_chain as chain
+import polymarket_store as store
 
 
 # ============ STATE ============
@@ -23,109 +29,207 @@ wallets = {}
 state = {
     "positions": {},      # asset -> {size, avg_price, title, outcome}
     "realized_pnl": 0.0,
+    "cash": 0.0,          # flux net USDC
     "trades": [],         # historique
     "seen": set(),        # trade_ids déjà traités
     "last_ts": {},        # wallet -> dernier timestamp
+    "last_block": 0,      # dernier bloc traité (DETECTOR = "chain")
 }
 
+# Comptes qui copient: {nom: {"prefix": str, "allocations": {wallet: float}, "state": dict}}
+# Compte unique "main" (state global) si FOLLOWER_ACCOUNTS est vide
+accounts = {}
+
 stats = {
     "detected": 0,
     "copied": 0,
     "skipped_slippage": 0,
     "skipped_funds": 0,
     "skipped_price": 0,
+    "skipped_timeout": 0,
     "total_slippage": 0.0,
 }
 
+# I/O en parallèle (wallet value, prix, ordres des comptes)
+executor = ThreadPoolExecutor(max_workers=32)
+# Ordres découpés (jusqu'à SLICE_HORIZON chacun): pool séparé, ne bloque jamais le pre-trade
+slice_executor = ThreadPoolExecutor(max_workers=8)
+quotes = {}  # (asset, side) -> (timestamp, future prix)
+pending = []  # ordres découpés en cours: (trade, usdc, exec_price, slippage, nom compte, future)
+deferred = []  # trades en attente qu'un ordre découpé sur le même asset soit réglé, ordre de détection
+
 
 # ============ SIZING ============
 
-def calc_size(wallet, original_usdc):
+def calc_size(wallet, original_usdc, allocated=None):
     """Calcule le montant à investir basé sur le ratio allocated/wallet_value, arrondi à l'entier inférieur"""
     info = wallets.get(wallet)
     if not info or info["value"] <= 0:
         return 0
-    ratio = info["allocated"] / info["value"]
+    if allocated is None:
+        allocated = info["allocated"]
+    ratio = allocated / info["value"]
     return int(original_usdc * ratio)
 
 
-# ============ EXECUTION ============
+def skip(trade, reason, stat=None, account=None):
+    """Comptabilise et log un trade non copié (account=None: skip avant dimensionnement, tous comptes)"""
+    if stat:
+        stats[stat] += 1
+    tag = f"[{account}] " if account and len(accounts) > 1 else ""
+    print(f"      ⏭️ {tag}SKIP: {reason}")
+    store.record_decision(trade, "skip", reason, account=account)
+    return None
 
-def execute_trade(trade, usdc_amount):
-    """Exécute un trade (simulation ou live)"""
-    asset = trade["asset"]
+
+# ============ PRE-TRADE ============
+
+def get_quote(asset, side):
+    """Retourne un future sur le prix d'exécution, réutilise un prix pré-chargé encore frais"""
+    key = (asset, side)
+    cached = quotes.pop(key, None)
+    if cached and time.time() - cached[0] < QUOTE_TTL and not failed_quote(cached[1]):
+        quotes[key] = cached
+        return cached[1]
+    future = executor.submit(pm.get_execution_price, asset, side)
+    quotes[key] = (time.time(), future)
+    return future
+
+
+def failed_quote(future):
+    """Prix résolu mais indisponible (0): à ne pas réutiliser"""
+    return future.done() and (future.exception() is not None or future.result() == 0)
+
+
+def held_assets():
+    """Assets détenus par au moins un compte"""
+    return {asset for account in accounts.values() for asset in account["state"]["positions"]}
+
+
+def prewarm_quotes():
+    """Purge les prix expirés puis pré-charge les prix SELL des positions détenues (SELL probables)"""
+    now = time.time()
+    for key in [k for k, (ts, _) in quotes.items() if now - ts >= QUOTE_TTL]:
+        del quotes[key]
+    for asset in held_assets():
+        get_quote(asset, "SELL")
+
+
+def check_price(trade, exec_price):
+    """Vérifie bornes de prix et slippage. Retourne le slippage ou None si skip"""
     side = trade["side"]
     original_price = float(trade["price"])
-    
-    # Récupère prix actuel
-    exec_price = pm.get_execution_price(asset, side)
+
     if exec_price == 0:
-        stats["skipped_price"] += 1
-        print(f"      ⏭️ SKIP: No price available")
-        return None
+        return skip(trade, "No price available", "skipped_price")
     
     if exec_price > MAX_PRICE:
-        stats["skipped_price"] += 1
-        print(f"      ⏭️ SKIP: Price too high")
-        return None
+        return skip(trade, "Price too high", "skipped_price")
     
     if exec_price < MIN_PRICE:
-        stats["skipped_price"] += 1
-        print(f"      ⏭️ SKIP: Price too low")
-        return None
+        return skip(trade, "Price too low", "skipped_price")
 
     # Calcule slippage
     slippage = pm.calc_slippage(original_price, exec_price, side)
     print(f"      Original: {original_price:.4f} → Exec: {exec_price:.4f} (slip: {slippage*100:+.2f}%)")
     
     if slippage > MAX_SLIPPAGE:
-        stats["skipped_slippage"] += 1
-        print(f"      ⏭️ SKIP: Slippage {slippage*100:.1f}% > max {MAX_SLIPPAGE*100:.1f}%")
-        return None
-    
-    # Exécute
+        return skip(trade, f"Slippage {slippage*100:.1f}% > max {MAX_SLIPPAGE*100:.1f}%", "skipped_slippage")
+
+    return slippage
+
+
+def pretrade(trade):
+    """Lance wallet value et prix en parallèle, skip dès qu'une limite est violée.
+    Retourne (exec_price, slippage) ou None si skip"""
+    wallet = trade["wallet"]
+    asset = trade["asset"]
+    side = trade["side"]
+
+    if side == "SELL" and asset not in held_assets():
+        return skip(trade, "No position to sell")
+
+    value_future = executor.submit(pm.get_wallet_value, wallet)
+    price_future = get_quote(asset, side)
+
+    slippage = None
+    try:
+        for future in as_completed([value_future, price_future], timeout=PRETRADE_TIMEOUT):
+            if future is price_future:
+                slippage = check_price(trade, price_future.result())
+                if slippage is None:
+                    return None
+    except FuturesTimeout:
+        return skip(trade, f"Pre-trade timeout (>{PRETRADE_TIMEOUT}s)", "skipped_timeout")
+
+    wallets.get(wallet, {})["value"] = value_future.result()
+    return price_future.result(), slippage
+
+
+# ============ EXECUTION ============
+
+def execute_trade(trade, usdc_amount, exec_price, slippage, name="main", order=None):
+    """Enregistre l'exécution d'un trade pour un compte (simulation, ou résultat de l'ordre live)"""
+    asset = trade["asset"]
+    side = trade["side"]
+    original_price = float(trade["price"])
+    account_state = accounts[name]["state"]
+    tag = f"[{name}] " if len(accounts) > 1 else ""
+
+    filled_fraction = 1.0
+
+    # Résultat de l'ordre
     if MODE == "live":
-        result = pm.place_market_order(asset, side, usdc_amount)
-        if not result["success"]:
-            print(f"      ❌ ORDER FAILED: {result['error']}")
+        if not order["success"]:
+            print(f"      ❌ {tag}ORDER FAILED: {order['error']}")
+            store.record_decision(trade, "failed", order["error"], usdc_amount, account=name)
             return None
-        print(f"      ✅ LIVE ORDER: {result['response']}")
+        if "slices" in order:
+            # Ordre découpé: prix moyen et montant réellement exécutés
+            print(f"      ✅ {tag}SLICED ORDER: {len(order['slices'])} slices, {order['filled_fraction']:.0%} filled ({order['stop']})")
+            usdc_amount = order["filled_usdc"]
+            exec_price = order["avg_price"]
+            slippage = pm.calc_slippage(original_price, exec_price, side)
+            filled_fraction = order["filled_fraction"]
+        else:
+            print(f"      ✅ {tag}LIVE ORDER: {order['response']}")
     
     # Update state
     shares = usdc_amount / exec_price
+    realized = 0.0
     
     if side == "BUY":
-        state["cash"] -= usdc_amount
+        account_state["cash"] -= usdc_amount
         
-        if asset in state["positions"]:
-            pos = state["positions"][asset]
+        if asset in account_state["positions"]:
+            pos = account_state["positions"][asset]
             total_cost = pos["size"] * pos["avg_price"] + usdc_amount
             total_shares = pos["size"] + shares
             pos["avg_price"] = total_cost / total_shares
             pos["size"] = total_shares
         else:
-            state["positions"][asset] = {
+            account_state["positions"][asset] = {
                 "size": shares,
                 "avg_price": exec_price,
                 "title": trade.get("title", ""),
                 "outcome": trade.get("outcome", ""),
             }
     else:
-        if asset not in state["positions"]:
-            print(f"      ⏭️ SKIP: No position to sell")
-            return None
+        if asset not in account_state["positions"]:
+            return skip(trade, "No position to sell", account=name)
         
-        pos = state["positions"][asset]
+        pos = account_state["positions"][asset]
         shares = min(shares, pos["size"])
         actual_usdc = shares * exec_price
         
         cost_sold = shares * pos["avg_price"]
-        state["realized_pnl"] += actual_usdc - cost_sold
-        state["cash"] += actual_usdc
+        realized = actual_usdc - cost_sold
+        account_state["realized_pnl"] += realized
+        account_state["cash"] += actual_usdc
         
         pos["size"] -= shares
         if pos["size"] < 0.001:
-            del state["positions"][asset]
+            del account_state["positions"][asset]
     
     stats["copied"] += 1
     stats["total_slippage"] += abs(slippage)
@@ -139,10 +243,13 @@ def execute_trade(trade, usdc_amount):
         "orig_price": original_price,
         "slippage": slippage,
         "usdc": usdc_amount,
+        "filled_fraction": filled_fraction,
         "asset": asset,
         "title": trade.get("title", "")[:50],
     }
-    state["trades"].append(executed)
+    account_state["trades"].append(executed)
+    store.record_fill(trade, executed, realized, name)
+    store.record_position(asset, account_state["positions"].get(asset), name)
     save_state()
     
     return executed
@@ -150,9 +257,20 @@ def execute_trade(trade, usdc_amount):
 
 # ============ MONITORING ============
 
+def busy_assets():
+    """Assets avec un ordre découpé en cours (position pas encore à jour)"""
+    return {item[0]["asset"] for item in pending}
+
+
 def process_trade(trade):
-    """Traite un nouveau trade détecté"""
+    """Traite un nouveau trade détecté. Différé si un ordre découpé sur le même asset n'est pas réglé"""
+    if trade["asset"] in busy_assets():
+        deferred.append(trade)
+        print(f"\n   ⏸️ DEFERRED: {trade['side']} {trade.get('title', '')[:45]} (sliced order in progress)")
+        return
+
     stats["detected"] += 1
+    store.record_detected(trade)
     wallet = trade["wallet"]
     info = wallets.get(wallet, {})
 
@@ -162,42 +280,146 @@ def process_trade(trade):
     print(f"   {trade.get('title', '')[:55]}...")
     print(f"   Outcome: {trade.get('outcome')}")
 
-    # Refresh wallet value
-    info["value"] = pm.get_wallet_value(wallet)
+    # Refresh wallet value + prix en parallèle
+    quote = pretrade(trade)
+    if quote is None:
+        return
+    exec_price, slippage = quote
+
     ratio = info["allocated"] / info["value"] if info["value"] > 0 else 0
     print(f"   Wallet: ${info['value']:,.0f} | Allocated: ${info['allocated']:,.0f} | Ratio: {ratio:.2%}")
 
-    usdc = calc_size(wallet, float(trade["usdcSize"]))
+    copy_trade(trade, exec_price, slippage)
 
-    if usdc < 1:
-        stats["skipped_funds"] += 1
-        print(f"\n      ⏭️ SKIP: Amount too small (${usdc})")
-        return
 
-    print(f"\n   📥 Copying with ${usdc}...")
-    result = execute_trade(trade, usdc)
+def copy_trade(trade, exec_price, slippage):
+    """Dimensionne le trade pour chaque compte, poste les ordres en parallèle puis met à jour les états.
+    Les ordres découpés (jusqu'à SLICE_HORIZON) sont réglés plus tard par settle_orders, sans bloquer le polling"""
+    wallet = trade["wallet"]
+    asset = trade["asset"]
+    side = trade["side"]
 
+    sized = {}
+    for name, account in accounts.items():
+        tag = f"[{name}] " if len(accounts) > 1 else ""
+        usdc = calc_size(wallet, float(trade["usdcSize"]), account["allocations"].get(wallet, 0))
+
+        if usdc < 1:
+            print()
+            skip(trade, f"Amount too small (${usdc})", "skipped_funds", account=name)
+            continue
+        if side == "SELL" and asset not in account["state"]["positions"]:
+            skip(trade, "No position to sell", account=name)
+            continue
+
+        print(f"\n   📥 {tag}Copying with ${usdc}...")
+        store.record_decision(trade, "copy", usdc=usdc, account=name)
+        sized[name] = usdc
+
+    # Signature + envoi concurrents: N comptes ≈ le temps d'un seul ordre
+    orders = {}
+    if MODE == "live":
+        for name, usdc in sized.items():
+            prefix = accounts[name]["prefix"]
+            # SELL: le montant de l'ordre est en shares, plafonné à la position
+            held = accounts[name]["state"]["positions"].get(asset, {}).get("size", 0)
+            if usdc >= SLICE_THRESHOLD:
+                future = slice_executor.submit(
+                    pm.place_sliced_order, asset, side, usdc, float(trade["price"]), MAX_SLIPPAGE, prefix,
+                    min_price=MIN_PRICE, max_price=MAX_PRICE, max_shares=held if side == "SELL" else None,
+                    participation=SLICE_PARTICIPATION, interval=SLICE_INTERVAL, horizon=SLICE_HORIZON,
+                    min_slice=SLICE_MIN,
+                )
+                pending.append((trade, usdc, exec_price, slippage, name, future))
+            else:
+                amount = usdc if side == "BUY" else min(usdc / exec_price, held)
+                orders[name] = executor.submit(pm.place_market_order, asset, side, amount, prefix=prefix)
+
+    for name, usdc in sized.items():
+        if MODE == "live" and name not in orders:
+            continue  # ordre découpé en cours
+        order = orders[name].result() if name in orders else None
+        report(execute_trade(trade, usdc, exec_price, slippage, name, order), name)
+
+
+def report(result, name):
+    """Affiche un trade copié"""
     if result:
         mode_tag = "🔴 LIVE" if MODE == "live" else "🟡 SIM"
-        print(f"\n   ✅ {mode_tag}: {result['side']} {result['shares']:.2f} @ {result['exec_price']:.4f}")
+        tag = f"[{name}] " if len(accounts) > 1 else ""
+        print(f"\n   ✅ {mode_tag}: {tag}{result['side']} {result['shares']:.2f} @ {result['exec_price']:.4f}")
+
+
+def settle_orders(wait=False):
+    """Applique les ordres découpés terminés (tous si wait=True) aux états des comptes"""
+    for item in list(pending):
+        trade, usdc, exec_price, slippage, name, future = item
+        if wait or future.done():
+            pending.remove(item)
+            report(execute_trade(trade, usdc, exec_price, slippage, name, future.result()), name)
+
+
+def replay_deferred():
+    """Traite, dans l'ordre de détection, les trades différés dont l'asset n'a plus d'ordre découpé en cours"""
+    for trade in list(deferred):
+        if trade["asset"] not in busy_assets():
+            deferred.remove(trade)
+            process_trade(trade)
 
 
 def poll_wallets():
     """Poll tous les wallets pour nouveaux trades"""
     for wallet in wallets:
-        trades = pm.get_trades(wallet, limit=20)
+        trades = pm.poll_trades(wallet, limit=20)
+        if not trades:  # None = réponse inchangée
+            continue
 
+        # Triés du plus récent au plus ancien: s'arrête au premier déjà vu
+        last_ts = state["last_ts"].get(wallet, 0)
+        new_trades = []
         for t in trades:
-            trade_id = f"{t.get('timestamp')}:{t.get('asset')}:{t.get('side')}"
             ts = t.get("timestamp", 0)
+            if ts <= last_ts:
+                break
+            trade_id = f"{ts}:{t.get('asset')}:{t.get('side')}"
 
-            if trade_id not in state["seen"] and ts > state["last_ts"].get(wallet, 0):
+            if trade_id not in state["seen"]:
                 state["seen"].add(trade_id)
                 t["wallet"] = wallet
-                process_trade(t)
+                new_trades.append(t)
 
-        if trades:
-            state["last_ts"][wallet] = max(state["last_ts"].get(wallet, 0), max(t.get("timestamp", 0) for t in trades))
+        # Lance tous les prix d'un coup avant de traiter
+        for t in new_trades:
+            get_quote(t["asset"], t["side"])
+        for t in new_trades:
+            process_trade(t)
+
+        state["last_ts"][wallet] = max(last_ts, trades[0].get("timestamp", 0))
+
+
+def poll_chain():
+    """Poll les events OrderFilled on-chain de tous les wallets en une passe.
+    Re-scanne les CHAIN_RESCAN_BLOCKS derniers blocs: node RPC en retard ou reorg ne perdent pas de fills"""
+    from_block = max(state["last_block"] + 1 - CHAIN_RESCAN_BLOCKS, 0)
+    try:
+        trades, last_block = chain.poll_fills(wallets, from_block)
+    except Exception as e:
+        print(f"⚠️ Chain poll failed: {e}")
+        return
+    state["last_block"] = last_block
+
+    new_trades = []
+    for t in trades:
+        # tx + ordre: stable même si un reorg change le logIndex
+        trade_id = f"{t['transactionHash']}:{t['orderHash']}"
+        if trade_id not in state["seen"]:
+            state["seen"].add(trade_id)
+            new_trades.append(t)
+
+    for t in new_trades:
+        get_quote(t["asset"], t["side"])
+    for t in new_trades:
+        process_trade(t)
 
 
 # ============ STATUS ============
@@ -212,7 +434,7 @@ def print_status():
     print(f"  Detected:      {stats['detected']}")
     print(f"  Copied:        {stats['copied']}")
     print(f"  Avg slippage:  {avg_slip*100:.2f}%")
-    print(f"  Skipped:       {stats['skipped_slippage']} slip / {stats['skipped_funds']} funds / {stats['skipped_price']} price")
+    print(f"  Skipped:       {stats['skipped_slippage']} slip / {stats['skipped_funds']} funds / {stats['skipped_price']} price / {stats['skipped_timeout']} timeout")
     print(f"{'='*60}\n")
 
 
@@ -225,6 +447,10 @@ def save_state():
         "mode": MODE,
         "trades": state["trades"][-100:],
         "stats": stats,
+        "accounts": {
+            name: {"realized_pnl": a["state"]["realized_pnl"], "trades": a["state"]["trades"][-100:]}
+            for name, a in accounts.items() if a["state"] is not state
+        },
     }
     with open(SAVE_FILE, "w") as f:
         json.dump(data, f, indent=2)
@@ -244,6 +470,11 @@ def load_state():
         for t in state["trades"]:
             state["seen"].add(f"{t.get('time')}:{t.get('asset')}:{t.get('side')}")
 
+        for name, a in data.get("accounts", {}).items():
+            if name in accounts:
+                accounts[name]["state"]["realized_pnl"] = a.get("realized_pnl", 0.0)
+                accounts[name]["state"]["trades"] = a.get("trades", [])
+
         for k, v in data.get("stats", {}).items():
             if k in stats:
                 stats[k] = v
@@ -257,6 +488,30 @@ def load_state():
 
 # ============ MAIN ============
 
+def init_accounts():
+    """Construit les comptes qui copient et pré-authentifie leurs clients en live"""
+    if not FOLLOWER_ACCOUNTS:
+        allocations = {wallet: info["allocated"] for wallet, info in wallets.items()}
+        accounts["main"] = {"prefix": "POLYMARKET", "allocations": allocations, "state": state}
+    else:
+        print(f"\nFan-out to {len(FOLLOWER_ACCOUNTS)} accounts:")
+        for name, prefix, allocations in FOLLOWER_ACCOUNTS:
+            accounts[name] = {
+                "prefix": prefix,
+                "allocations": {w.lower(): a for w, a in allocations.items()},
+                "state": {"positions": {}, "realized_pnl": 0.0, "cash": 0.0, "trades": []},
+            }
+            print(f"  • {name} ({prefix}_*): ${sum(allocations.values()):,.0f} allocated")
+
+    if MODE == "live":
+        futures = {name: executor.submit(pm.get_client, a["prefix"]) for name, a in accounts.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  ⚠️ {name}: client auth failed ({e}), will retry on first order")
+
+
 def main():
     global wallets
 
@@ -292,11 +547,14 @@ def main():
         print("❌ No valid wallets!")
         return
 
+    init_accounts()
+
     print(f"\nMax slippage: {MAX_SLIPPAGE*100:.1f}%")
     print(f"Poll: {POLL_INTERVAL}s")
     print("=" * 60)
 
     load_state()
+    store.init(DB_FILE)
 
     # Init timestamps
     print("\n⏳ Initializing...")
@@ -308,6 +566,10 @@ def main():
                 state["seen"].add(f"{t.get('timestamp')}:{t.get('asset')}:{t.get('side')}")
             print(f"   @{info['name']} last: {datetime.fromtimestamp(state['last_ts'][wallet]).strftime('%H:%M:%S')}")
 
+    if DETECTOR == "chain":
+        state["last_block"] = chain.get_block_number()
+        print(f"   On-chain detector from block {state['last_block']}")
+
     print("\n✅ Ready! Watching for trades...\n")
     print_status()
 
@@ -315,18 +577,28 @@ def main():
 
     try:
         while True:
-            poll_wallets()
+            prewarm_quotes()
+            if DETECTOR == "chain":
+                poll_chain()
+            else:
+                poll_wallets()
+            settle_orders()
+            replay_deferred()
 
             if time.time() - last_status > 120:
                 print_status()
                 last_status = time.time()
 
-            time.sleep(POLL_INTERVAL)
+            time.sleep(CHAIN_POLL_INTERVAL if DETECTOR == "chain" else POLL_INTERVAL)
 
     except KeyboardInterrupt:
         print("\n\n👋 Stopping...")
+        settle_orders(wait=True)
+        for trade in deferred:
+            skip(trade, "Stopped before deferred trade could be copied")
         print_status()
         save_state()
+        store.flush()
         print(f"State saved to {SAVE_FILE}")
 
 
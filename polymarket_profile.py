@@ -16,13 +16,14 @@ USERNAME = 'gabagool22'
 
 BASE_GAMMA = "https://gamma-api.polymarket.com"
 BASE_DATA = "https://data-api.polymarket.com"
+TIMEOUT = 10
 
 
-def search_profile(username: str) -> dict | None:
+def search_profile(username: str, session=requests, timeout: float = TIMEOUT) -> dict | None:
     """Recherche un profil par username"""
     url = f"{BASE_GAMMA}/public-search"
     params = {"q": username, "search_profiles": "true"}
-    resp = requests.get(url, params=params)
+    resp = session.get(url, params=params, timeout=timeout)
     resp.raise_for_status()
     
     profiles = resp.json().get("profiles", [])
@@ -36,41 +37,59 @@ def search_profile(username: str) -> dict | None:
     return profiles[0]
 
 
-def get_profile_by_wallet(wallet: str) -> dict | None:
+def get_profile_by_wallet(wallet: str, session=requests, timeout: float = TIMEOUT) -> dict | None:
     """Récupère un profil par wallet address"""
     url = f"{BASE_GAMMA}/public-profile"
     params = {"address": wallet}
-    resp = requests.get(url, params=params)
+    resp = session.get(url, params=params, timeout=timeout)
     if resp.status_code == 404:
         return None
     resp.raise_for_status()
     return resp.json()
 
 
-def get_recent_trades(wallet: str, limit: int = 20) -> list:
+def get_recent_trades(wallet: str, limit: int = 20, offset: int = 0,
+                      session=requests, timeout: float = TIMEOUT) -> list:
     """Récupère les trades récents d'un wallet"""
     url = f"{BASE_DATA}/activity"
     params = {
         "user": wallet,
         "type": "TRADE",
         "limit": limit,
+        "offset": offset,
         "sortBy": "TIMESTAMP",
         "sortDirection": "DESC"
     }
-    resp = requests.get(url, params=params)
+    resp = session.get(url, params=params, timeout=timeout)
     resp.raise_for_status()
     return resp.json()
 
 
-def get_positions(wallet: str, limit: int = 50) -> list:
+def get_positions(wallet: str, limit: int = 50, offset: int = 0,
+                  session=requests, timeout: float = TIMEOUT) -> list:
     """Récupère les positions ouvertes"""
     url = f"{BASE_DATA}/positions"
     params = {
         "user": wallet,
         "sizeThreshold": 0.1,
-        "limit": limit
+        "limit": limit,
+        "offset": offset
+    }
+    resp = session.get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def get_closed_positions(wallet: str, limit: int = 50, offset: int = 0,
+                         session=requests, timeout: float = TIMEOUT) -> list:
+    """Récupère les positions fermées (vendues ou redeem) avec leur PnL réalisé"""
+    url = f"{BASE_DATA}/closed-positions"
+    params = {
+        "user": wallet,
+        "limit": limit,
+        "offset": offset
     }
-    resp = requests.get(url, params=params)
+    resp = session.get(url, params=params, timeout=timeout)
     resp.raise_for_status()
     return resp.json()
 
@@ -0,0 +1,325 @@
+"""
+Polymarket Trader Scanner
+Scan en masse de wallets/usernames candidats et classement pour choisir TARGET_WALLETS
+
+Les historiques sont récupérés en parallèle (rate limit global, cache disque),
+écrits au fil de l'eau en chunks colonnes (.npz), puis agrégés chunk par chunk
+avec NumPy (mémoire bornée quel que soit le nombre de wallets).
+
+Usage:
+    python polymarket_scanner.py candidates.txt --workers 32 --rps 50 --top 50
+    (une ligne par candidat: 0x..., username, @username ou "nom: 0x...")
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import requests
+
+import polymarket_profile as profile
+from CONFIG import MIN_PRICE, MAX_PRICE
+
+CACHE_DIR = Path(".scan_cache")
+CACHE_TTL = 6 * 3600      # s
+PAGE_SIZE = 500           # trades / positions par requête
+CLOSED_PAGE_SIZE = 50     # max accepté par /closed-positions
+MAX_TRADES = 2000         # historique max par wallet
+MAX_POSITIONS = 1000
+CHUNK_ROWS = 200_000      # lignes par chunk .npz
+MAX_RETRIES = 3
+
+_local = threading.local()
+_rate_lock = threading.Lock()
+_next_slot = [0.0]
+
+
+# ============ HTTP ============
+
+def get_session():
+    """Session HTTP par thread (keep-alive)"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def throttle(rps):
+    """Rate limit global: espace les requêtes de 1/rps seconde, tous threads confondus"""
+    with _rate_lock:
+        now = time.monotonic()
+        slot = max(now, _next_slot[0])
+        _next_slot[0] = slot + 1.0 / rps
+    if slot > now:
+        time.sleep(slot - now)
+
+
+def call(fn, *args, rps, **kwargs):
+    """Appelle une fonction de polymarket_profile avec rate limit et retries (429/5xx/timeouts)"""
+    for attempt in range(MAX_RETRIES):
+        throttle(rps)
+        try:
+            return fn(*args, session=get_session(), **kwargs)
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = getattr(e.response, "status_code", None)
+            if status is not None and status < 500 and status != 429:
+                raise
+            if attempt == MAX_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+# ============ FETCH ============
+
+def resolve(candidate, rps):
+    """Candidat (wallet ou username) -> wallet en minuscules, ou None"""
+    candidate = candidate.strip().lstrip("@")
+    if ":" in candidate:
+        candidate = candidate.split(":")[-1].strip()
+    if candidate.startswith("0x") and len(candidate) == 42:
+        return candidate.lower()
+    p = call(profile.search_profile, candidate, rps=rps)
+    wallet = p.get("proxyWallet") if p else None
+    return wallet.lower() if wallet else None
+
+
+def fetch_wallet(wallet, rps, max_trades=MAX_TRADES):
+    """Historique de trades + positions (ouvertes et fermées) d'un wallet, via le cache disque si frais"""
+    cache_file = CACHE_DIR / f"{wallet}.v2.json"
+    if cache_file.exists() and time.time() - cache_file.stat().st_mtime < CACHE_TTL:
+        with open(cache_file) as f:
+            return json.load(f)
+
+    trades = []
+    while len(trades) < max_trades:
+        page = call(profile.get_recent_trades, wallet, limit=PAGE_SIZE, offset=len(trades), rps=rps)
+        trades += page
+        if len(page) < PAGE_SIZE:
+            break
+
+    positions = []
+    while len(positions) < MAX_POSITIONS:
+        page = call(profile.get_positions, wallet, limit=PAGE_SIZE, offset=len(positions), rps=rps)
+        positions += page
+        if len(page) < PAGE_SIZE:
+            break
+
+    closed = []
+    while len(closed) < MAX_POSITIONS:
+        page = call(profile.get_closed_positions, wallet, limit=CLOSED_PAGE_SIZE, offset=len(closed), rps=rps)
+        closed += page
+        if len(page) < CLOSED_PAGE_SIZE:
+            break
+
+    # Historique tronqué: ne garde que les positions fermées dans la fenêtre couverte par les trades
+    trades = trades[:max_trades]
+    window_start = min(t.get("timestamp", 0) for t in trades) if len(trades) >= max_trades else 0
+
+    # Ne garde que les champs utiles au classement: positions = [pnl, coût, fermée]
+    data = {
+        "trades": [[t.get("timestamp", 0), 1 if t.get("side") == "BUY" else -1,
+                    float(t.get("price") or 0), float(t.get("usdcSize") or 0)] for t in trades],
+        "positions": [[float(p.get("cashPnl") or 0) + float(p.get("realizedPnl") or 0),
+                       float(p.get("initialValue") or 0), 0] for p in positions]
+                   + [[float(p.get("realizedPnl") or 0),
+                       float(p.get("avgPrice") or 0) * float(p.get("totalBought") or 0), 1]
+                      for p in closed if (p.get("timestamp") or 0) >= window_start],
+    }
+    with open(cache_file, "w") as f:
+        json.dump(data, f)
+    return data
+
+
+# ============ STOCKAGE COLONNES ============
+
+class ChunkWriter:
+    """Accumule les lignes et écrit des chunks colonnes compressés (trades_XXXX.npz / positions_XXXX.npz)"""
+
+    def __init__(self, out_dir, name, columns):
+        self.out_dir = out_dir
+        self.name = name
+        self.columns = columns  # {colonne: dtype}
+        self.rows = []
+        self.wallet_idx = []
+        self.count = 0
+
+    def add(self, idx, rows):
+        self.rows += rows
+        self.wallet_idx += [idx] * len(rows)
+        if len(self.rows) >= CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = np.asarray(self.rows, dtype=np.float64).reshape(len(self.rows), len(self.columns))
+        arrays = {col: table[:, i].astype(dtype) for i, (col, dtype) in enumerate(self.columns.items())}
+        arrays["wallet"] = np.asarray(self.wallet_idx, dtype=np.int32)
+        np.savez_compressed(self.out_dir / f"{self.name}_{self.count:04d}.npz", **arrays)
+        self.count += 1
+        self.rows, self.wallet_idx = [], []
+
+
+TRADE_COLUMNS = {"ts": np.int64, "side": np.int8, "price": np.float32, "usdc": np.float32}
+POSITION_COLUMNS = {"pnl": np.float32, "cost": np.float32, "closed": np.int8}
+
+
+def scan(candidates, out_dir, workers=32, rps=50, max_trades=MAX_TRADES):
+    """Résout et récupère tous les candidats en parallèle, écrit les chunks. Retourne la liste des wallets"""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(exist_ok=True)
+    for old in out_dir.glob("*.npz"):
+        old.unlink()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        print(f"Resolving {len(candidates)} candidates...")
+        futures = [pool.submit(resolve, c, rps) for c in candidates]
+        wallets, seen = [], set()
+        for future in as_completed(futures):
+            try:
+                wallet = future.result()
+            except Exception:
+                wallet = None
+            if wallet and wallet not in seen:
+                seen.add(wallet)
+                wallets.append(wallet)
+        print(f"  ✅ {len(wallets)} wallets")
+
+        trades_out = ChunkWriter(out_dir, "trades", TRADE_COLUMNS)
+        positions_out = ChunkWriter(out_dir, "positions", POSITION_COLUMNS)
+        futures = {pool.submit(fetch_wallet, w, rps, max_trades): i for i, w in enumerate(wallets)}
+        done, failed, t0 = 0, 0, time.time()
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                data = future.result()
+                trades_out.add(idx, data["trades"])
+                positions_out.add(idx, data["positions"])
+            except Exception as e:
+                failed += 1
+                print(f"  ⚠️ {wallets[idx][:12]}... failed: {e}")
+            done += 1
+            if done % 500 == 0:
+                print(f"  {done}/{len(wallets)} wallets ({done / (time.time() - t0):.1f}/s)")
+        trades_out.flush()
+        positions_out.flush()
+
+    with open(out_dir / "wallets.json", "w") as f:
+        json.dump(wallets, f)
+    print(f"  ✅ {done - failed} scanned, {failed} failed in {time.time() - t0:.0f}s")
+    return wallets
+
+
+# ============ MÉTRIQUES ============
+
+def compute_metrics(out_dir, slippage=0.01):
+    """Agrège les chunks (NumPy, chunk par chunk). Retourne (wallets, {métrique: array})"""
+    with open(out_dir / "wallets.json") as f:
+        wallets = json.load(f)
+    n = len(wallets)
+
+    n_trades = np.zeros(n)
+    volume = np.zeros(n)
+    copyable = np.zeros(n)
+    first_ts = np.full(n, np.inf)
+    last_ts = np.full(n, -np.inf)
+    for path in sorted(out_dir.glob("trades_*.npz")):
+        c = np.load(path)
+        w = c["wallet"]
+        n_trades += np.bincount(w, minlength=n)
+        volume += np.bincount(w, weights=c["usdc"], minlength=n)
+        # Prix obtenu en copiant avec un slippage typique: reste-t-il dans [MIN_PRICE, MAX_PRICE] ?
+        exec_price = c["price"] * (1 + slippage * c["side"])
+        ok = (exec_price >= MIN_PRICE) & (exec_price <= MAX_PRICE)
+        copyable += np.bincount(w, weights=ok, minlength=n)
+        np.minimum.at(first_ts, w, c["ts"])
+        np.maximum.at(last_ts, w, c["ts"])
+
+    # Positions ouvertes + fermées dans la fenêtre des trades: PnL et capital sur le même ensemble
+    pnl = np.zeros(n)
+    capital = np.zeros(n)
+    n_positions = np.zeros(n)
+    wins = np.zeros(n)
+    for path in sorted(out_dir.glob("positions_*.npz")):
+        c = np.load(path)
+        w = c["wallet"]
+        pos_pnl = c["pnl"].astype(np.float64)
+        pnl += np.bincount(w, weights=pos_pnl, minlength=n)
+        capital += np.bincount(w, weights=c["cost"], minlength=n)
+        n_positions += np.bincount(w, minlength=n)
+        wins += np.bincount(w, weights=pos_pnl > 0, minlength=n)
+
+    days = np.where(n_trades > 0, np.maximum((last_ts - first_ts) / 86400, 1.0), 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_size = np.where(n_trades > 0, volume / n_trades, 0.0)
+        win_rate = np.where(n_positions > 0, wins / n_positions, 0.0)
+        copyable_frac = np.where(n_trades > 0, copyable / n_trades, 0.0)
+        # Chaque dollar engagé paie ~slippage à l'entrée: PnL attendu en copiant
+        copy_pnl = pnl - slippage * capital
+        copy_roi = np.where(capital > 0, copy_pnl / capital, 0.0)
+
+    return wallets, {
+        "pnl": pnl,
+        "copy_pnl": copy_pnl,
+        "copy_roi": copy_roi,
+        "win_rate": win_rate,
+        "trades_per_day": n_trades / days,
+        "avg_size": avg_size,
+        "volume": volume,
+        "capital": capital,
+        "n_trades": n_trades,
+        "copyable": copyable_frac,
+        "score": copy_roi * copyable_frac,
+    }
+
+
+def save_ranking(wallets, metrics, path):
+    """Écrit le classement complet en CSV, trié par score décroissant"""
+    order = np.argsort(-metrics["score"])
+    names = list(metrics)
+    with open(path, "w") as f:
+        f.write("wallet," + ",".join(names) + "\n")
+        for i in order:
+            f.write(wallets[i] + "," + ",".join(f"{metrics[k][i]:.6g}" for k in names) + "\n")
+    return order
+
+
+# ============ MAIN ============
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan and rank Polymarket traders")
+    parser.add_argument("candidates", help="file with one wallet or username per line")
+    parser.add_argument("--out", default="scan", help="output directory")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--rps", type=float, default=50, help="max requests per second (global)")
+    parser.add_argument("--max-trades", type=int, default=MAX_TRADES)
+    parser.add_argument("--slippage", type=float, default=0.01, help="typical copy slippage")
+    parser.add_argument("--min-trades", type=int, default=20)
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--no-fetch", action="store_true", help="only recompute metrics from --out")
+    args = parser.parse_args()
+
+    out_dir = Path(args.out)
+    if not args.no_fetch:
+        with open(args.candidates) as f:
+            candidates = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        scan(candidates, out_dir, args.workers, args.rps, args.max_trades)
+
+    wallets, metrics = compute_metrics(out_dir, args.slippage)
+    order = save_ranking(wallets, metrics, out_dir / "ranking.csv")
+    order = [i for i in order if metrics["n_trades"][i] >= args.min_trades][:args.top]
+
+    print(f"\n{'='*100}")
+    print(f"{'wallet':44} {'score':>7} {'PnL':>11} {'copy ROI':>9} {'win':>6} {'trades/d':>9} {'avg $':>9} {'copyable':>9}")
+    print(f"{'='*100}")
+    for i in order:
+        print(f"{wallets[i]:44} {metrics['score'][i]:>+7.3f} {metrics['pnl'][i]:>+11,.0f} "
+              f"{metrics['copy_roi'][i]*100:>+8.1f}% {metrics['win_rate'][i]*100:>5.0f}% "
+              f"{metrics['trades_per_day'][i]:>9.1f} {metrics['avg_size'][i]:>9,.0f} {metrics['copyable'][i]*100:>8.0f}%")
+    print(f"\nFull ranking: {out_dir / 'ranking.csv'}")
+
+
+if __name__ == "__main__":
+    main()
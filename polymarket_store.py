@@ -0,0 +1,288 @@
+"""
+Polymarket State Store
+Historique indexé (SQLite) des trades détectés, décisions, fills et positions
+
+Les écritures passent par une queue et un thread writer (commits groupés),
+pour ne jamais bloquer execute_trade. Les lectures ouvrent leur propre
+connexion (WAL = lecteurs concurrents).
+
+Usage:
+    python polymarket_store.py trades --wallet 0x... --asset 123... --days 7
+    python polymarket_store.py pnl --days 30
+    python polymarket_store.py positions
+"""
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+
+from CONFIG import DB_FILE
+
+BATCH_SIZE = 500       # max écritures par commit
+FLUSH_INTERVAL = 0.5   # délai max (s) avant commit d'un batch partiel
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detected (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    wallet TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price REAL,
+    size REAL,
+    usdc REAL,
+    title TEXT,
+    outcome TEXT
+);
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    wallet TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    side TEXT NOT NULL,
+    action TEXT NOT NULL,
+    reason TEXT,
+    usdc REAL,
+    account TEXT
+);
+CREATE TABLE IF NOT EXISTS fills (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    account TEXT NOT NULL,
+    wallet TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    side TEXT NOT NULL,
+    shares REAL,
+    exec_price REAL,
+    orig_price REAL,
+    slippage REAL,
+    usdc REAL,
+    realized_pnl REAL,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS positions (
+    account TEXT NOT NULL,
+    asset TEXT NOT NULL,
+    size REAL,
+    avg_price REAL,
+    title TEXT,
+    outcome TEXT,
+    updated REAL,
+    PRIMARY KEY (account, asset)
+);
+CREATE INDEX IF NOT EXISTS idx_detected_wallet ON detected (wallet, time);
+CREATE INDEX IF NOT EXISTS idx_detected_asset ON detected (asset, time);
+CREATE INDEX IF NOT EXISTS idx_detected_time ON detected (time);
+CREATE INDEX IF NOT EXISTS idx_decisions_wallet ON decisions (wallet, time);
+CREATE INDEX IF NOT EXISTS idx_decisions_asset ON decisions (asset, time);
+CREATE INDEX IF NOT EXISTS idx_decisions_time ON decisions (time);
+CREATE INDEX IF NOT EXISTS idx_fills_wallet ON fills (wallet, time);
+CREATE INDEX IF NOT EXISTS idx_fills_asset ON fills (asset, time);
+CREATE INDEX IF NOT EXISTS idx_fills_time ON fills (time);
+"""
+
+_queue = queue.Queue()
+_writer = None
+_path = DB_FILE
+
+
+# ============ CONNEXION ============
+
+def connect(path=None):
+    """Ouvre une connexion SQLite en mode WAL"""
+    conn = sqlite3.connect(path or _path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init(path=DB_FILE):
+    """Crée le schéma et démarre le thread writer"""
+    global _writer, _path
+    _path = path
+    conn = connect(path)
+    conn.executescript(SCHEMA)
+    # Migration: decisions.account (NULL = décision avant dimensionnement, tous comptes)
+    if "account" not in [r["name"] for r in conn.execute("PRAGMA table_info(decisions)")]:
+        conn.execute("ALTER TABLE decisions ADD COLUMN account TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_decisions_account ON decisions (account, time)")
+    conn.commit()
+    if _writer is None or not _writer.is_alive():
+        _writer = threading.Thread(target=_write_loop, args=(conn,), daemon=True)
+        _writer.start()
+
+
+def _write_loop(conn):
+    """Vide la queue par batchs: un commit pour jusqu'à BATCH_SIZE écritures"""
+    while True:
+        try:
+            batch = [_queue.get(timeout=FLUSH_INTERVAL)]
+        except queue.Empty:
+            continue
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with conn:
+                for sql, params in batch:
+                    conn.execute(sql, params)
+        except Exception as e:
+            print(f"⚠️ Store write failed: {e}")
+        for _ in batch:
+            _queue.task_done()
+
+
+def flush():
+    """Attend que toutes les écritures en attente soient commitées"""
+    if _writer is not None:
+        _queue.join()
+
+
+# ============ ÉCRITURES ============
+
+def record_detected(trade):
+    """Enregistre un trade détecté chez un wallet suivi"""
+    _queue.put((
+        "INSERT INTO detected (time, wallet, asset, side, price, size, usdc, title, outcome) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (float(trade.get("timestamp") or time.time()), trade["wallet"], trade["asset"], trade["side"],
+         float(trade.get("price", 0)), float(trade.get("size", 0)), float(trade.get("usdcSize", 0)),
+         trade.get("title", ""), trade.get("outcome", "")),
+    ))
+
+
+def record_decision(trade, action, reason="", usdc=0, account=None):
+    """Enregistre la décision prise pour un trade (copy / skip / failed), par compte si account"""
+    _queue.put((
+        "INSERT INTO decisions (time, account, wallet, asset, side, action, reason, usdc) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (time.time(), account, trade["wallet"], trade["asset"], trade["side"], action, reason, usdc),
+    ))
+
+
+def record_fill(trade, executed, realized_pnl=0.0, account="main"):
+    """Enregistre un fill (simulé ou live)"""
+    _queue.put((
+        "INSERT INTO fills (time, account, wallet, asset, side, shares, exec_price, orig_price, slippage, usdc, realized_pnl, title) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (executed["time"], account, trade["wallet"], executed["asset"], executed["side"], executed["shares"],
+         executed["exec_price"], executed["orig_price"], executed["slippage"], executed["usdc"],
+         realized_pnl, executed["title"]),
+    ))
+
+
+def record_position(asset, pos, account="main"):
+    """Upsert d'une position (pos=None si fermée)"""
+    if pos is None:
+        _queue.put(("DELETE FROM positions WHERE account = ? AND asset = ?", (account, asset)))
+        return
+    _queue.put((
+        "INSERT OR REPLACE INTO positions (account, asset, size, avg_price, title, outcome, updated) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (account, asset, pos["size"], pos["avg_price"], pos.get("title", ""), pos.get("outcome", ""), time.time()),
+    ))
+
+
+# ============ REQUÊTES ============
+
+def _where(wallet=None, asset=None, since=None, until=None, account=None):
+    """Construit la clause WHERE sur les colonnes indexées"""
+    clauses, params = [], []
+    if account:
+        clauses.append("account = ?")
+        params.append(account)
+    if wallet:
+        clauses.append("wallet = ?")
+        params.append(wallet.lower())
+    if asset:
+        clauses.append("asset = ?")
+        params.append(asset)
+    if since:
+        clauses.append("time >= ?")
+        params.append(since)
+    if until:
+        clauses.append("time < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query(table, wallet=None, asset=None, since=None, until=None, limit=1000, account=None):
+    """Retourne les lignes de detected/decisions/fills filtrées, plus récentes d'abord"""
+    if table not in ("detected", "decisions", "fills"):
+        raise ValueError(f"Unknown table: {table}")
+    if account and table == "detected":
+        raise ValueError("detected has no account column")
+    where, params = _where(wallet, asset, since, until, account)
+    conn = connect()
+    try:
+        rows = conn.execute(f"SELECT * FROM {table}{where} ORDER BY time DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def pnl_by_wallet(since=None, until=None):
+    """PnL réalisé, volume et nb de fills par wallet copié"""
+    where, params = _where(since=since, until=until)
+    conn = connect()
+    try:
+        rows = conn.execute(
+            f"SELECT wallet, COUNT(*) AS fills, SUM(usdc) AS volume, SUM(realized_pnl) AS realized_pnl, "
+            f"AVG(slippage) AS avg_slippage FROM fills{where} GROUP BY wallet ORDER BY realized_pnl DESC",
+            params,
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def get_positions(account=None):
+    """Positions courantes (toutes ou d'un account)"""
+    conn = connect()
+    try:
+        if account:
+            rows = conn.execute("SELECT * FROM positions WHERE account = ?", (account,)).fetchall()
+        else:
+            rows = conn.execute("SELECT * FROM positions").fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+# ============ CLI ============
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the copytrading store")
+    parser.add_argument("command", choices=["trades", "detected", "decisions", "pnl", "positions"])
+    parser.add_argument("--wallet")
+    parser.add_argument("--asset")
+    parser.add_argument("--account")
+    parser.add_argument("--days", type=float, help="only the last N days")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--db", default=DB_FILE)
+    args = parser.parse_args()
+
+    init(args.db)
+    since = time.time() - args.days * 86400 if args.days else None
+
+    if args.command == "pnl":
+        for r in pnl_by_wallet(since=since):
+            print(f"{r['wallet']}  fills: {r['fills']:>5}  volume: ${r['volume'] or 0:>10,.2f}  "
+                  f"PnL: ${r['realized_pnl'] or 0:>+10,.2f}  slip: {(r['avg_slippage'] or 0)*100:+.2f}%")
+    elif args.command == "positions":
+        for r in get_positions(args.account):
+            print(f"[{r['account']}] {r['size']:>10.2f} @ {r['avg_price']:.4f}  {r['title'][:45]} → {r['outcome']}")
+    else:
+        table = "fills" if args.command == "trades" else args.command
+        for r in query(table, wallet=args.wallet, asset=args.asset, since=since, limit=args.limit, account=args.account):
+            ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(r["time"]))
+            extra = r.get("action") or f"{r.get('shares', r.get('size', 0)):.2f} @ {r.get('exec_price', r.get('price', 0)):.4f}"
+            acct = f"[{r['account']}]  " if r.get("account") else ""
+            print(f"{ts}  {acct}{r['wallet'][:12]}  {r['side']:4}  {r['asset'][:12]}...  {extra}  {r.get('reason') or ''}")
+
+
+if __name__ == "__main__":
+    main()
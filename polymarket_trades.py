@@ -2,10 +2,19 @@
 Polymarket API - Prix et Ordres
 """
 import os
+import json
+import math
+import threading
 import time
 import requests
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 load_dotenv()
 
 # URLs
@@ -15,6 +24,15 @@ CLOB_API_URL = "https://clob.polymarket.com"
 HOST = "https://clob.polymarket.com"
 CHAIN_ID = 137
 
+_local = threading.local()  # une session keep-alive par thread (polling, carnets, slices)
+
+
+def get_session():
+    """Session HTTP par thread (keep-alive)"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
 
 # ============ PROFIL ============
 
@@ -117,7 +135,16 @@ def get_price(token_id):
 
 
 def get_execution_price(token_id, side):
-    """Retourne le prix d'exécution pour un side (BUY/SELL)"""
+    """Retourne le prix d'exécution pour un side (BUY/SELL) en un seul appel, fallback sur get_price"""
+    try:
+        r = requests.get(f"{CLOB_API_URL}/price", params={"token_id": token_id, "side": side}, timeout=5)
+        if r.status_code == 200:
+            price = float(r.json().get("price", 0))
+            if price > 0:
+                return price
+    except:
+        pass
+
     prices = get_price(token_id)
     if side == "BUY":
         return prices["ask"]
@@ -125,18 +152,81 @@ def get_execution_price(token_id, side):
         return prices["bid"]
 
 
+def get_order_book(token_id):
+    """Récupère le carnet: {"bids": [(price, size)] décroissants, "asks": [(price, size)] croissants, "tick_size"}"""
+    try:
+        r = get_session().get(f"{CLOB_API_URL}/book", params={"token_id": token_id}, timeout=5)
+        if r.status_code == 200:
+            data = _loads(r.content)
+            return {
+                "bids": sorted(((float(l["price"]), float(l["size"])) for l in data.get("bids", [])), reverse=True),
+                "asks": sorted((float(l["price"]), float(l["size"])) for l in data.get("asks", [])),
+                "tick_size": float(data.get("tick_size") or 0.01),
+            }
+    except:
+        pass
+    return {"bids": [], "asks": [], "tick_size": 0.01}
+
+
+def walk_book(book, side, usdc_amount, limit_price):
+    """Parcourt le carnet jusqu'à limit_price. Retourne (usdc exécutable, shares correspondantes)"""
+    levels = book["asks"] if side == "BUY" else book["bids"]
+    usdc, shares = 0.0, 0.0
+    for price, size in levels:
+        if (side == "BUY" and price > limit_price) or (side == "SELL" and price < limit_price):
+            break
+        take = min(price * size, usdc_amount - usdc)
+        usdc += take
+        shares += take / price
+        if usdc >= usdc_amount:
+            break
+    return usdc, shares
+
+
 # ============ ACTIVITÉ ============
 
+_etags = {}    # wallet -> ETag de la dernière réponse /activity
+_digests = {}  # wallet -> hash du dernier body /activity
+
+
 def get_trades(wallet, limit=20):
     """Récupère les trades récents d'un wallet"""
     try:
-        r = requests.get(
+        r = get_session().get(
             f"{DATA_API_URL}/activity",
             params={"user": wallet, "type": "TRADE", "limit": limit, "sortBy": "TIMESTAMP", "sortDirection": "DESC"},
             timeout=10
         )
         if r.status_code == 200:
-            return r.json()
+            return _loads(r.content)
+    except:
+        pass
+    return []
+
+
+def poll_trades(wallet, limit=20):
+    """Comme get_trades, mais retourne None sans décoder si la réponse n'a pas changé depuis le dernier appel"""
+    headers = {"If-None-Match": _etags[wallet]} if wallet in _etags else {}
+    try:
+        r = get_session().get(
+            f"{DATA_API_URL}/activity",
+            params={"user": wallet, "type": "TRADE", "limit": limit, "sortBy": "TIMESTAMP", "sortDirection": "DESC"},
+            headers=headers,
+            timeout=10
+        )
+        if r.status_code == 304:
+            return None
+        if r.status_code != 200:
+            return []
+        if "ETag" in r.headers:
+            _etags[wallet] = r.headers["ETag"]
+
+        # Pas d'ETag côté serveur: compare le hash du body brut
+        digest = hash(r.content)
+        if _digests.get(wallet) == digest:
+            return None
+        _digests[wallet] = digest
+        return _loads(r.content)
     except:
         pass
     return []
@@ -175,16 +265,22 @@ def get_wallet_value(wallet):
 
 # ============ ORDRES LIVE ============
 
-def get_client():
-    """Crée un client CLOB authentifié"""
+_clients = {}  # préfixe .env -> client authentifié
+
+
+def get_client(prefix="POLYMARKET"):
+    """Crée (ou réutilise) un client CLOB authentifié avec les variables {prefix}_* du .env"""
+    if prefix in _clients:
+        return _clients[prefix]
+
     from py_clob_client.client import ClobClient
     
-    key = os.getenv("POLYMARKET_PRIVATE_KEY")
+    key = os.getenv(f"{prefix}_PRIVATE_KEY")
     if not key:
-        raise ValueError("POLYMARKET_PRIVATE_KEY not set in .env")
+        raise ValueError(f"{prefix}_PRIVATE_KEY not set in .env")
     
-    signature_type = int(os.getenv("POLYMARKET_SIGNATURE_TYPE", "0"))
-    funder = os.getenv("POLYMARKET_FUNDER")
+    signature_type = int(os.getenv(f"{prefix}_SIGNATURE_TYPE", "0"))
+    funder = os.getenv(f"{prefix}_FUNDER")
     
     if funder:
         client = ClobClient(HOST, key=key, chain_id=CHAIN_ID, signature_type=signature_type, funder=funder)
@@ -192,11 +288,21 @@ def get_client():
         client = ClobClient(HOST, key=key, chain_id=CHAIN_ID)
     
     client.set_api_creds(client.create_or_derive_api_creds())
+    _clients[prefix] = client
     return client
 
 
-def place_market_order(token_id, side, usd_amount, max_retries=3):
-    """Place un ordre market FOK"""
+def is_auth_error(e):
+    """Erreur d'authentification (401/403, clé API invalide) -> le client en cache n'est plus valide"""
+    if getattr(e, "status_code", None) in (401, 403):
+        return True
+    msg = str(e).lower()
+    return any(k in msg for k in ("unauthorized", "forbidden", "invalid api key", "api key"))
+
+
+def place_market_order(token_id, side, amount, max_retries=3, prefix="POLYMARKET", price=0):
+    """Place un ordre market FOK avec le compte {prefix}_* du .env
+    amount = USDC pour un BUY, shares pour un SELL; price = pire prix accepté (0 = auto)"""
     from py_clob_client.clob_types import MarketOrderArgs, OrderType
     from py_clob_client.order_builder.constants import BUY, SELL
     
@@ -204,17 +310,20 @@ def place_market_order(token_id, side, usd_amount, max_retries=3):
     
     for attempt in range(max_retries):
         try:
-            client = get_client()
+            client = get_client(prefix)
             args = MarketOrderArgs(
                 token_id=token_id,
-                amount=usd_amount,
+                amount=amount,
                 side=order_side,
+                price=price,
                 order_type=OrderType.FOK
             )
             signed = client.create_market_order(args)
             resp = client.post_order(signed, OrderType.FOK)
             return {"success": True, "response": resp}
         except Exception as e:
+            if is_auth_error(e):
+                _clients.pop(prefix, None)  # ré-authentifie au prochain essai
             if attempt < max_retries - 1:
                 print(f"  ⚠️ Order attempt {attempt+1} failed: {e}, retrying...")
                 time.sleep(1)
@@ -224,6 +333,100 @@ def place_market_order(token_id, side, usd_amount, max_retries=3):
     return {"success": False, "error": "Max retries exceeded"}
 
 
+def limit_price_for(side, ref_price, max_slippage, tick, min_price, max_price):
+    """Pire prix accepté: ref ± slippage, borné à [min_price, max_price] et [tick, 1 - tick],
+    arrondi au tick du côté sûr (BUY vers le bas, SELL vers le haut)"""
+    if side == "BUY":
+        limit = min(ref_price * (1 + max_slippage), max_price, 1 - tick)
+        return round(math.floor(limit / tick + 1e-9) * tick, 6)
+    limit = max(ref_price * (1 - max_slippage), min_price, tick)
+    return round(math.ceil(limit / tick - 1e-9) * tick, 6)
+
+
+def place_sliced_order(token_id, side, usd_amount, ref_price, max_slippage, prefix="POLYMARKET",
+                       min_price=0.01, max_price=0.99, max_shares=None,
+                       participation=0.5, interval=0.5, horizon=10.0, min_slice=5.0,
+                       book_fn=get_order_book, order_fn=place_market_order):
+    """Découpe un gros ordre en slices FOK dimensionnées sur la profondeur initiale du carnet.
+    Re-cote avant chaque slice, s'arrête sur limite de slippage, horizon ou échecs répétés.
+    usd_amount en USDC (SELL: converti en shares, plafonné à max_shares).
+    book_fn / order_fn remplaçables (ex: carnet simulé)"""
+    book = book_fn(token_id)
+    limit_price = limit_price_for(side, ref_price, max_slippage, book.get("tick_size", 0.01), min_price, max_price)
+    deadline = time.time() + horizon
+
+    # Taille de slice fixée sur la profondeur initiale (pas de slices qui rétrécissent à chaque fill)
+    initial_depth, _ = walk_book(book, side, float("inf"), limit_price)
+    slice_target = max(initial_depth * participation, min_slice)
+
+    filled_usdc, filled_shares = 0.0, 0.0
+    slices, failures = [], 0
+    stop = "filled"
+    while usd_amount - filled_usdc >= min_slice:
+        if time.time() > deadline:
+            stop = "horizon"
+            break
+
+        # Re-cote (le premier carnet vient d'être lu)
+        if slices or failures:
+            book = book_fn(token_id)
+        depth, _ = walk_book(book, side, float("inf"), limit_price)
+        slice_usdc = min(usd_amount - filled_usdc, slice_target, depth)
+        if slice_usdc < min_slice:
+            stop = "slippage"
+            break
+        est_usdc, est_shares = walk_book(book, side, slice_usdc, limit_price)
+
+        if side == "BUY":
+            amount = math.floor(slice_usdc * 100) / 100
+        else:
+            if max_shares is not None and est_shares > max_shares - filled_shares:
+                capped = max(max_shares - filled_shares, 0)
+                est_usdc, est_shares = est_usdc * capped / est_shares, capped
+            amount = math.floor(est_shares * 100) / 100
+            if amount <= 0:
+                stop = "position"
+                break
+
+        result = order_fn(token_id, side, amount, max_retries=1, prefix=prefix, price=limit_price)
+        if not result["success"]:
+            failures += 1
+            if failures >= 2:
+                stop = f"failed: {result['error']}"
+                break
+            time.sleep(interval)
+            continue
+        failures = 0
+
+        # Montants réels si la réponse les donne, sinon estimation sur le carnet
+        resp = result.get("response") or {}
+        making, taking = float(resp.get("makingAmount") or 0), float(resp.get("takingAmount") or 0)
+        if making > 0 and taking > 0:
+            usdc, shares = (making, taking) if side == "BUY" else (taking, making)
+        elif side == "BUY":
+            usdc, shares = amount, amount * est_shares / est_usdc
+        else:
+            usdc, shares = amount * est_usdc / est_shares, amount
+        filled_usdc += usdc
+        filled_shares += shares
+        slices.append({"usdc": usdc, "shares": shares, "price": usdc / shares if shares else 0})
+
+        if usd_amount - filled_usdc >= min_slice:
+            time.sleep(interval)
+
+    if not slices:
+        return {"success": False, "error": f"No slice filled ({stop})"}
+    return {
+        "success": True,
+        "filled_usdc": filled_usdc,
+        "shares": filled_shares,
+        "avg_price": filled_usdc / filled_shares,
+        "filled_fraction": min(filled_usdc / usd_amount, 1.0),
+        "slices": slices,
+        "stop": stop,
+    }
+
+
 # ============ UTILS ============
 
 def calc_slippage(original_price, execution_price, side):